@@ -19,6 +19,10 @@ ANSI_ALWAYS = 'Always'
 # Controls when ANSI escape sequences are allowed in output
 allow_ansi = ANSI_TERMINAL
 
+# Lowercase values for case-insensitive comparisons against allow_ansi
+_ANSI_NEVER_LOWER = ANSI_NEVER.lower()
+_ANSI_TERMINAL_LOWER = ANSI_TERMINAL.lower()
+
 # Regular expression to match ANSI escape sequences
 ANSI_ESCAPE_RE = re.compile(r'\x1b[^m]*m')
 
@@ -83,6 +87,9 @@ def strip_ansi(text: str) -> str:
     :param text: string which may contain ANSI escape sequences
     :return: the same string with any ANSI escape sequences removed
     """
+    # Most strings have no escape sequences, and checking for ESC is much cheaper than running the regex
+    if '\x1b' not in text:
+        return text
     return ANSI_ESCAPE_RE.sub('', text)
 
 
@@ -93,7 +100,13 @@ def ansi_safe_wcswidth(text: str) -> int:
     :param text: the string being measured
     """
     # Strip ANSI escape sequences since they cause wcswidth to return -1
-    return wcswidth(strip_ansi(text))
+    text = strip_ansi(text)
+
+    # wcswidth examines each character in Python. Since every printable ASCII character
+    # is one column wide, skip it for strings made up of only those characters.
+    if not text or (max(text) < '\x80' and text.isprintable()):
+        return len(text)
+    return wcswidth(text)
 
 
 def ansi_aware_write(fileobj: IO, msg: str) -> None:
@@ -103,8 +116,9 @@ def ansi_aware_write(fileobj: IO, msg: str) -> None:
     :param fileobj: the file object being written to
     :param msg: the string being written
     """
-    if allow_ansi.lower() == ANSI_NEVER.lower() or \
-            (allow_ansi.lower() == ANSI_TERMINAL.lower() and not fileobj.isatty()):
+    allow_ansi_lower = allow_ansi.lower()
+    if allow_ansi_lower == _ANSI_NEVER_LOWER or \
+            (allow_ansi_lower == _ANSI_TERMINAL_LOWER and not fileobj.isatty()):
         msg = strip_ansi(msg)
     fileobj.write(msg)
 
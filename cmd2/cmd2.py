@@ -26,22 +26,22 @@ Git repository on GitHub at https://github.com/python-cmd2/cmd2
 # infrequently utilized. To reduce the initial overhead of
 # import this module, many of these imports are lazy-loaded
 # i.e. we only import the module when we use it
-# For example, we don't import the 'traceback' module
-# until the pexcept() function is called and the debug
-# setting is True
+# For example, we don't import the 'pickle' module
+# until persistent history is read or written
 import argparse
 import cmd
-import glob
-import inspect
+import datetime
+import functools
+import importlib.util
 import os
-import pickle
-import re
+import shutil
+import subprocess
 import sys
 import threading
-from code import InteractiveConsole
-from collections import namedtuple
+import time
+import traceback
 from contextlib import redirect_stdout
-from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Type, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple, Type, Union
 
 from . import Cmd2ArgumentParser, CompletionItem
 from . import ansi
@@ -52,6 +52,14 @@ from .clipboard import can_clip, get_paste_buffer, write_to_paste_buffer
 from .history import History, HistoryItem
 from .parsing import StatementParser, Statement, Macro, MacroArg, shlex_split
 
+# The code module is only imported when do_py() runs
+if TYPE_CHECKING:  # pragma: no cover
+    import code
+
+if sys.platform != 'win32':
+    import pwd
+    import termios
+
 # Set up readline
 from .rl_utils import rl_type, RlType, rl_get_point, rl_set_prompt, vt100_support, rl_make_safe_prompt
 
@@ -63,6 +71,30 @@ if rl_type == RlType.NONE:  # pragma: no cover
 else:
     from .rl_utils import rl_force_redisplay, readline
 
+    if rl_type == RlType.GNU:
+
+        # Get the readline lib so we can make changes to it
+        import ctypes
+        from .rl_utils import readline_lib
+
+# Original readline settings which cmd2 overrides and sometimes needs to restore. These are
+# looked up by _init_readline_state() the first time a Cmd with tab completion is created.
+_readline_initialized = False
+orig_rl_delims = None
+orig_pyreadline_display = None
+rl_basic_quote_characters = None
+orig_rl_basic_quotes = None
+
+
+def _init_readline_state() -> None:
+    """Save the original readline settings before cmd2 changes any of them"""
+    global _readline_initialized, orig_rl_delims, orig_pyreadline_display
+    global rl_basic_quote_characters, orig_rl_basic_quotes
+
+    if _readline_initialized or rl_type == RlType.NONE:
+        return
+    _readline_initialized = True
+
     # Used by rlcompleter in Python console loaded by py command
     orig_rl_delims = readline.get_completer_delims()
 
@@ -73,21 +105,14 @@ else:
         orig_pyreadline_display = readline.rl.mode._display_completions
 
     elif rl_type == RlType.GNU:
-
-        # Get the readline lib so we can make changes to it
-        import ctypes
-        from .rl_utils import readline_lib
-
         rl_basic_quote_characters = ctypes.c_char_p.in_dll(readline_lib, "rl_basic_quote_characters")
         orig_rl_basic_quotes = ctypes.cast(rl_basic_quote_characters, ctypes.c_void_p).value
 
-# Detect whether IPython is installed to determine if the built-in "ipy" command should be included
-ipython_available = True
-try:
-    # noinspection PyUnresolvedReferences,PyPackageRequirements
-    from IPython import embed
-except ImportError:  # pragma: no cover
-    ipython_available = False
+
+# Detect whether IPython is installed to determine if the built-in "ipy" command should be included.
+# Importing IPython is slow, so only look for it here. It is imported when the ipy command runs.
+ipython_available = importlib.util.find_spec('IPython') is not None
+
 
 INTERNAL_COMMAND_EPILOG = ("Notes:\n"
                            "  This command is for internal use and is not intended to be called from the\n"
@@ -109,6 +134,36 @@ NATURAL_SORT_KEY = utils.natural_keys
 # Used as the command name placeholder in disabled command messages.
 COMMAND_NAME = "<COMMAND_NAME>"
 
+# Descriptions of the built-in settable parameters. Each Cmd instance gets its own copy in self.settable.
+_DEFAULT_SETTABLE = {
+    # allow_ansi is a special case in which it's an application-wide setting defined in ansi.py
+    'allow_ansi': ('Allow ANSI escape sequences in output '
+                   '(valid values: {}, {}, {})'.format(ansi.ANSI_TERMINAL, ansi.ANSI_ALWAYS, ansi.ANSI_NEVER)),
+    'continuation_prompt': 'On 2nd+ line of input',
+    'debug': 'Show full error stack on error',
+    'echo': 'Echo command issued into output',
+    'editor': 'Program used by ``edit``',
+    'feedback_to_output': 'Include nonessentials in `|`, `>` results',
+    'locals_in_py': 'Allow access to your application in py via self',
+    'max_completion_items': 'Maximum number of CompletionItems to display during tab completion',
+    'prompt': 'The prompt issued to solicit input',
+    'quiet': "Don't print nonessential feedback",
+    'timing': 'Report execution times'
+}
+
+# How many seconds the list of users tab completed for ~user paths is kept before it's read again
+_USER_CACHE_TIMEOUT = 60
+
+# Wildcard characters which path completion won't complete
+_PATH_WILDCARDS = frozenset('*?')
+
+# Sets of redirection tokens for fast membership tests during tab completion
+_REDIRECTION_TOKEN_SET = frozenset(constants.REDIRECTION_TOKENS)
+_FILE_REDIRECTION_TOKEN_SET = frozenset((constants.REDIRECTION_OUTPUT, constants.REDIRECTION_APPEND))
+
+# Maps the lowercase form of each valid allow_ansi value to the value itself
+_ALLOW_ANSI_VALUES = {value.lower(): value for value in (ansi.ANSI_TERMINAL, ansi.ANSI_ALWAYS, ansi.ANSI_NEVER)}
+
 ############################################################################################################
 # The following are optional attributes added to do_* command functions
 ############################################################################################################
@@ -116,9 +171,79 @@ COMMAND_NAME = "<COMMAND_NAME>"
 # The custom help category a command belongs to
 CMD_ATTR_HELP_CATEGORY = 'help_category'
 
-# The argparse parser for the command
+# The argparse parser for the command. If the parser was given to the decorator as a factory, then this
+# attribute does not exist until the parser has been built. Use CMD_ATTR_GET_ARGPARSER to reliably get it.
 CMD_ATTR_ARGPARSER = 'argparser'
 
+# Function which returns the argparse parser for the command, building it first if needed
+CMD_ATTR_GET_ARGPARSER = 'get_argparser'
+
+
+def _get_argparser(func: Optional[Callable]) -> Optional[argparse.ArgumentParser]:
+    """Get the argparse parser of a command function
+
+    Functions which only have the CMD_ATTR_ARGPARSER attribute, like those set up outside of the
+    argparse decorators, are still supported.
+
+    :param func: the command function
+    :return: the command's ArgumentParser or None if the command does not use argparse
+    """
+    get_argparser = getattr(func, CMD_ATTR_GET_ARGPARSER, None)
+    if get_argparser is None:
+        return getattr(func, CMD_ATTR_ARGPARSER, None)
+    return get_argparser()
+
+
+def _get_command_doc(func: Callable) -> Optional[str]:
+    """Get the help text of a command function
+
+    For argparse commands this is the parser's description, which may not be set until the parser is built.
+
+    :param func: the command function
+    :return: the command's help text or None if it has none
+    """
+    argparser = _get_argparser(func)
+    if argparser is not None:
+        return argparser.description
+    return func.__doc__
+
+
+def _make_argparser_getter(argparser: Union[argparse.ArgumentParser, Callable[[], argparse.ArgumentParser]],
+                           func: Callable, cmd_wrapper: Callable) -> Callable[[], argparse.ArgumentParser]:
+    """Create the function which returns the argparse parser of a command.
+
+    The parser is built (if argparser is a factory) and set up for the command the first time this function is called.
+
+    :param argparser: unique instance of ArgumentParser or a function which returns one
+    :param func: the do_* method being decorated
+    :param cmd_wrapper: the function which replaces func
+    :return: function which returns the command's ArgumentParser
+    """
+    parser = None
+
+    def get_argparser() -> argparse.ArgumentParser:
+        nonlocal parser
+        if parser is None:
+            parser = argparser() if callable(argparser) else argparser
+
+            # argparser defaults the program name to sys.argv[0]
+            # we want it to be the name of our command
+            parser.prog = func.__name__[len(COMMAND_FUNC_PREFIX):]
+
+            # If the description has not been set, then use the method docstring if one exists
+            if parser.description is None and func.__doc__:
+                parser.description = func.__doc__
+
+            # Set the command's help text as argparser.description (which can be None)
+            cmd_wrapper.__doc__ = parser.description
+
+            # Mark this function as having an argparse ArgumentParser
+            setattr(cmd_wrapper, CMD_ATTR_ARGPARSER, parser)
+
+        return parser
+
+    return get_argparser
+
 
 def categorize(func: Union[Callable, Iterable[Callable]], category: str) -> None:
     """Categorize a function.
@@ -128,11 +253,12 @@ def categorize(func: Union[Callable, Iterable[Callable]], category: str) -> None
     :param func: function or list of functions to categorize
     :param category: category to put it in
     """
-    if isinstance(func, Iterable):
+    # Check for a single function first since callable() is much cheaper than an isinstance() check against Iterable
+    if callable(func):
+        setattr(func, CMD_ATTR_HELP_CATEGORY, category)
+    else:
         for item in func:
             setattr(item, CMD_ATTR_HELP_CATEGORY, category)
-    else:
-        setattr(func, CMD_ATTR_HELP_CATEGORY, category)
 
 
 def with_category(category: str) -> Callable:
@@ -151,8 +277,6 @@ def with_argument_list(*args: List[Callable], preserve_quotes: bool = False) ->
     :param preserve_quotes: if True, then argument quotes will not be stripped
     :return: function that gets passed a list of argument strings
     """
-    import functools
-
     def arg_decorator(func: Callable):
         @functools.wraps(func)
         def cmd_wrapper(cmd2_app, statement: Union[Statement, str]):
@@ -174,14 +298,17 @@ def with_argument_list(*args: List[Callable], preserve_quotes: bool = False) ->
         return arg_decorator
 
 
-def with_argparser_and_unknown_args(argparser: argparse.ArgumentParser, *,
+def with_argparser_and_unknown_args(argparser: Union[argparse.ArgumentParser,
+                                                     Callable[[], argparse.ArgumentParser]], *,
                                     ns_provider: Optional[Callable[..., argparse.Namespace]] = None,
                                     preserve_quotes: bool = False) -> \
         Callable[[argparse.Namespace, List], Optional[bool]]:
     """A decorator to alter a cmd2 method to populate its ``args`` argument by parsing arguments with the given
     instance of argparse.ArgumentParser, but also returning unknown args as a list.
 
-    :param argparser: unique instance of ArgumentParser
+    :param argparser: unique instance of ArgumentParser or a function which returns one. Passing a function
+                      defers building the parser until the command is first run, tab completed, or has
+                      its help displayed.
     :param ns_provider: An optional function that accepts a cmd2.Cmd object as an argument and returns an
                         argparse.Namespace. This is useful if the Namespace needs to be prepopulated with
                         state data that affects parsing.
@@ -191,8 +318,6 @@ def with_argparser_and_unknown_args(argparser: argparse.ArgumentParser, *,
              Statement object. This can be useful if the command function needs to know the command line.
 
     """
-    import functools
-
     def arg_decorator(func: Callable):
         @functools.wraps(func)
         def cmd_wrapper(cmd2_app, statement: Union[Statement, str]):
@@ -206,27 +331,21 @@ def with_argparser_and_unknown_args(argparser: argparse.ArgumentParser, *,
                 namespace = ns_provider(cmd2_app)
 
             try:
-                args, unknown = argparser.parse_known_args(parsed_arglist, namespace)
+                args, unknown = get_argparser().parse_known_args(parsed_arglist, namespace)
             except SystemExit:
                 return
             else:
-                setattr(args, '__statement__', statement)
+                args.__statement__ = statement
                 return func(cmd2_app, args, unknown)
 
-        # argparser defaults the program name to sys.argv[0]
-        # we want it to be the name of our command
         command_name = func.__name__[len(COMMAND_FUNC_PREFIX):]
-        argparser.prog = command_name
-
-        # If the description has not been set, then use the method docstring if one exists
-        if argparser.description is None and func.__doc__:
-            argparser.description = func.__doc__
 
-        # Set the command's help text as argparser.description (which can be None)
-        cmd_wrapper.__doc__ = argparser.description
+        get_argparser = _make_argparser_getter(argparser, func, cmd_wrapper)
+        setattr(cmd_wrapper, CMD_ATTR_GET_ARGPARSER, get_argparser)
 
-        # Mark this function as having an argparse ArgumentParser
-        setattr(cmd_wrapper, CMD_ATTR_ARGPARSER, argparser)
+        # A parser instance is set up now. A parser factory isn't called until the parser is first needed.
+        if not callable(argparser):
+            get_argparser()
 
         return cmd_wrapper
 
@@ -234,13 +353,15 @@ def with_argparser_and_unknown_args(argparser: argparse.ArgumentParser, *,
     return arg_decorator
 
 
-def with_argparser(argparser: argparse.ArgumentParser, *,
+def with_argparser(argparser: Union[argparse.ArgumentParser, Callable[[], argparse.ArgumentParser]], *,
                    ns_provider: Optional[Callable[..., argparse.Namespace]] = None,
                    preserve_quotes: bool = False) -> Callable[[argparse.Namespace], Optional[bool]]:
     """A decorator to alter a cmd2 method to populate its ``args`` argument by parsing arguments
     with the given instance of argparse.ArgumentParser.
 
-    :param argparser: unique instance of ArgumentParser
+    :param argparser: unique instance of ArgumentParser or a function which returns one. Passing a function
+                      defers building the parser until the command is first run, tab completed, or has
+                      its help displayed.
     :param ns_provider: An optional function that accepts a cmd2.Cmd object as an argument and returns an
                         argparse.Namespace. This is useful if the Namespace needs to be prepopulated with
                         state data that affects parsing.
@@ -249,8 +370,6 @@ def with_argparser(argparser: argparse.ArgumentParser, *,
              A member called __statement__ is added to the Namespace to provide command functions access to the
              Statement object. This can be useful if the command function needs to know the command line.
     """
-    import functools
-
     def arg_decorator(func: Callable):
         @functools.wraps(func)
         def cmd_wrapper(cmd2_app, statement: Union[Statement, str]):
@@ -264,27 +383,21 @@ def with_argparser(argparser: argparse.ArgumentParser, *,
                 namespace = ns_provider(cmd2_app)
 
             try:
-                args = argparser.parse_args(parsed_arglist, namespace)
+                args = get_argparser().parse_args(parsed_arglist, namespace)
             except SystemExit:
                 return
             else:
-                setattr(args, '__statement__', statement)
+                args.__statement__ = statement
                 return func(cmd2_app, args)
 
-        # argparser defaults the program name to sys.argv[0]
-        # we want it to be the name of our command
         command_name = func.__name__[len(COMMAND_FUNC_PREFIX):]
-        argparser.prog = command_name
-
-        # If the description has not been set, then use the method docstring if one exists
-        if argparser.description is None and func.__doc__:
-            argparser.description = func.__doc__
 
-        # Set the command's help text as argparser.description (which can be None)
-        cmd_wrapper.__doc__ = argparser.description
+        get_argparser = _make_argparser_getter(argparser, func, cmd_wrapper)
+        setattr(cmd_wrapper, CMD_ATTR_GET_ARGPARSER, get_argparser)
 
-        # Mark this function as having an argparse ArgumentParser
-        setattr(cmd_wrapper, CMD_ATTR_ARGPARSER, argparser)
+        # A parser instance is set up now. A parser factory isn't called until the parser is first needed.
+        if not callable(argparser):
+            get_argparser()
 
         return cmd_wrapper
 
@@ -321,7 +434,9 @@ class EmptyStatement(Exception):
 
 
 # Contains data about a disabled command which is used to restore its original functions when the command is enabled
-DisabledCommand = namedtuple('DisabledCommand', ['command_function', 'help_function', 'completer_function'])
+DisabledCommand = NamedTuple('DisabledCommand', [('command_function', Callable),
+                                                 ('help_function', Optional[Callable]),
+                                                 ('completer_function', Optional[Callable])])
 
 
 class Cmd(cmd.Cmd):
@@ -363,7 +478,7 @@ class Cmd(cmd.Cmd):
         :param shortcuts: dictionary containing shortcuts for commands. If not supplied, then defaults to
                           constants.DEFAULT_SHORTCUTS.
         """
-        # If use_ipython is False, make sure the do_ipy() method doesn't exit
+        # If use_ipython is False, make sure the do_ipy() method doesn't exist
         if not use_ipython:
             try:
                 del Cmd.do_ipy
@@ -377,6 +492,10 @@ class Cmd(cmd.Cmd):
         # Call super class constructor
         super().__init__(completekey=completekey, stdin=stdin, stdout=stdout)
 
+        # Readline only needs to be examined if this app will use it for tab completion
+        if self.completekey:
+            _init_readline_state()
+
         # Attributes which should NOT be dynamically settable via the set command at runtime
         # To prevent a user from altering these with the py/ipy commands, remove locals_in_py from the
         # settable dictionary during your applications's __init__ method.
@@ -384,6 +503,9 @@ class Cmd(cmd.Cmd):
         self.quit_on_sigint = False  # Quit the loop on interrupt instead of just resetting prompt
         self.allow_redirection = allow_redirection  # Security setting to prevent redirection of stdout
 
+        # The last prompt passed through visible_prompt and its stripped version
+        self._visible_prompt_cache = ('', '')
+
         # Attributes which ARE dynamically settable via the set command at runtime
         self.continuation_prompt = '> '
         self.debug = False
@@ -401,24 +523,7 @@ class Cmd(cmd.Cmd):
         self.timing = False  # Prints elapsed time for each command
 
         # To make an attribute settable with the "do_set" command, add it to this ...
-        self.settable = \
-            {
-                # allow_ansi is a special case in which it's an application-wide setting defined in ansi.py
-                'allow_ansi': ('Allow ANSI escape sequences in output '
-                               '(valid values: {}, {}, {})'.format(ansi.ANSI_TERMINAL,
-                                                                   ansi.ANSI_ALWAYS,
-                                                                   ansi.ANSI_NEVER)),
-                'continuation_prompt': 'On 2nd+ line of input',
-                'debug': 'Show full error stack on error',
-                'echo': 'Echo command issued into output',
-                'editor': 'Program used by ``edit``',
-                'feedback_to_output': 'Include nonessentials in `|`, `>` results',
-                'locals_in_py': 'Allow access to your application in py via self',
-                'max_completion_items': 'Maximum number of CompletionItems to display during tab completion',
-                'prompt': 'The prompt issued to solicit input',
-                'quiet': "Don't print nonessential feedback",
-                'timing': 'Report execution times'
-            }
+        self.settable = dict(_DEFAULT_SETTABLE)
 
         # Commands to exclude from the help menu and tab completion
         self.hidden_commands = ['eof', '_relative_load', '_relative_run_script']
@@ -428,10 +533,10 @@ class Cmd(cmd.Cmd):
         self._initialize_history(persistent_history_file)
 
         # Commands to exclude from the history command
-        self.exclude_from_history = '''history edit eof'''.split()
+        self.exclude_from_history = ['history', 'edit', 'eof']
 
         # Dictionary of macro names and their values
-        self.macros = dict()
+        self.macros = {}
 
         # Keeps track of typed command history in the Python shell
         self._py_history = []
@@ -440,7 +545,7 @@ class Cmd(cmd.Cmd):
         self.py_bridge_name = 'app'
 
         # Defines app-specific variables/functions available in Python shells and pyscripts
-        self.py_locals = dict()
+        self.py_locals = {}
 
         # True if running inside a Python script or interactive console, False otherwise
         self._in_py = False
@@ -450,10 +555,7 @@ class Cmd(cmd.Cmd):
                                                 shortcuts=shortcuts)
 
         # Verify commands don't have invalid names (like starting with a shortcut)
-        for cur_cmd in self.get_all_commands():
-            valid, errmsg = self.statement_parser.is_valid_command(cur_cmd)
-            if not valid:
-                raise ValueError("Invalid command name {!r}: {}".format(cur_cmd, errmsg))
+        self._validate_command_names()
 
         # Stores results from the last command run to enable usage of results in a Python script or interactive console
         # Built-in commands don't make use of this.  It is purely there for user-defined commands and convenience.
@@ -496,25 +598,33 @@ class Cmd(cmd.Cmd):
         # If a startup script is provided, then execute it in the startup commands
         if startup_script is not None:
             startup_script = os.path.abspath(os.path.expanduser(startup_script))
-            if os.path.exists(startup_script) and os.path.getsize(startup_script) > 0:
+
+            # A single stat tells us if the script exists and is not empty
+            try:
+                script_size = os.stat(startup_script).st_size
+            except OSError:
+                script_size = 0
+
+            if script_size > 0:
                 self._startup_commands.append("run_script '{}'".format(startup_script))
 
         # Transcript files to run instead of interactive command loop
         self._transcript_files = None
 
-        # Check for command line args
+        # Check for command line args. Don't bother building a parser if there aren't any.
         if allow_cli_args:
-            parser = argparse.ArgumentParser()
-            parser.add_argument('-t', '--test', action="store_true",
-                                help='Test against transcript(s) in FILE (wildcards OK)')
-            callopts, callargs = parser.parse_known_args()
-
-            # If transcript testing was called for, use other arguments as transcript files
-            if callopts.test:
-                self._transcript_files = callargs
-            # If commands were supplied at invocation, then add them to the command queue
-            elif callargs:
-                self._startup_commands.extend(callargs)
+            if len(sys.argv) > 1:
+                parser = argparse.ArgumentParser()
+                parser.add_argument('-t', '--test', action="store_true",
+                                    help='Test against transcript(s) in FILE (wildcards OK)')
+                callopts, callargs = parser.parse_known_args()
+
+                # If transcript testing was called for, use other arguments as transcript files
+                if callopts.test:
+                    self._transcript_files = callargs
+                # If commands were supplied at invocation, then add them to the command queue
+                elif callargs:
+                    self._startup_commands.extend(callargs)
         elif transcript_files:
             self._transcript_files = transcript_files
 
@@ -557,8 +667,14 @@ class Cmd(cmd.Cmd):
         # If False, then complete() will sort the matches using self.default_sort_key before they are displayed.
         self.matches_sorted = False
 
+        # Cache of ~user strings for users with a home directory, used when tab completing ~user paths.
+        # Reading the password database can be slow (e.g. when it's backed by LDAP), so the cache is only
+        # refreshed once it's older than _USER_CACHE_TIMEOUT seconds.
+        self._home_dir_users = None
+        self._home_dir_users_time = 0.0
+
         # Set the pager(s) for use with the ppaged() method for displaying output using a pager
-        if sys.platform.startswith('win'):
+        if sys.platform == 'win32':
             self.pager = self.pager_chop = 'more'
         else:
             # Here is the meaning of the various flags we are using with the less command:
@@ -580,10 +696,19 @@ class Cmd(cmd.Cmd):
         # being printed by a command.
         self.terminal_lock = threading.RLock()
 
+        # The terminal settings restored after each command. Saving them once lets the restore happen
+        # with a termios call instead of running 'stty sane' in a new process after every command.
+        self._saved_termios = None
+        if sys.platform != 'win32' and sys.stdin is not None and sys.stdin.isatty():
+            try:
+                self._saved_termios = termios.tcgetattr(sys.stdin.fileno())
+            except (termios.error, OSError):  # pragma: no cover
+                pass
+
         # Commands that have been disabled from use. This is to support commands that are only available
         # during specific states of the application. This dictionary's keys are the command names and its
         # values are DisabledCommand objects.
-        self.disabled_commands = dict()
+        self.disabled_commands = {}
 
         # If any command has been categorized, then all other commands that haven't been categorized
         # will display under this section in the help output.
@@ -600,13 +725,9 @@ class Cmd(cmd.Cmd):
     def allow_ansi(self, new_val: str) -> None:
         """Setter property needed to support do_set when it updates allow_ansi"""
         new_val = new_val.lower()
-        if new_val == ansi.ANSI_TERMINAL.lower():
-            ansi.allow_ansi = ansi.ANSI_TERMINAL
-        elif new_val == ansi.ANSI_ALWAYS.lower():
-            ansi.allow_ansi = ansi.ANSI_ALWAYS
-        elif new_val == ansi.ANSI_NEVER.lower():
-            ansi.allow_ansi = ansi.ANSI_NEVER
-        else:
+        try:
+            ansi.allow_ansi = _ALLOW_ANSI_VALUES[new_val]
+        except KeyError:
             self.perror('Invalid value: {} (valid values: {}, {}, {})'.format(new_val, ansi.ANSI_TERMINAL,
                                                                               ansi.ANSI_ALWAYS, ansi.ANSI_NEVER))
 
@@ -619,7 +740,13 @@ class Cmd(cmd.Cmd):
 
         :return: prompt stripped of any ANSI escape codes
         """
-        return ansi.strip_ansi(self.prompt)
+        # Prompts rarely change, so only strip the prompt when it's a different object than last time
+        prompt = self.prompt
+        cached_prompt, cached_visible_prompt = self._visible_prompt_cache
+        if prompt is not cached_prompt:
+            cached_visible_prompt = ansi.strip_ansi(prompt)
+            self._visible_prompt_cache = (prompt, cached_visible_prompt)
+        return cached_visible_prompt
 
     @property
     def aliases(self) -> Dict[str, str]:
@@ -679,7 +806,6 @@ class Cmd(cmd.Cmd):
                             where the message text already has the desired style. Defaults to True.
         """
         if self.debug and sys.exc_info() != (None, None, None):
-            import traceback
             traceback.print_exc()
 
         if isinstance(msg, Exception):
@@ -722,7 +848,6 @@ class Cmd(cmd.Cmd):
 
         WARNING: On Windows, the text always wraps regardless of what the chop argument is set to
         """
-        import subprocess
         if msg is not None and msg != '':
             try:
                 msg_str = '{}'.format(msg)
@@ -734,7 +859,7 @@ class Cmd(cmd.Cmd):
                 functional_terminal = False
 
                 if self.stdin.isatty() and self.stdout.isatty():
-                    if sys.platform.startswith('win') or os.environ.get('TERM') is not None:
+                    if sys.platform == 'win32' or os.environ.get('TERM') is not None:
                         functional_terminal = True
 
                 # Don't attempt to use a pager that can block if redirecting or running a script (either text or Python)
@@ -798,9 +923,10 @@ class Cmd(cmd.Cmd):
                  **On Failure**
                  - Two empty lists
         """
-        import copy
         unclosed_quote = ''
-        quotes_to_try = copy.copy(constants.QUOTES)
+
+        # Index into constants.QUOTES of the next closing quote to try
+        quote_index = 0
 
         tmp_line = line[:endidx]
         tmp_endidx = endidx
@@ -818,10 +944,10 @@ class Cmd(cmd.Cmd):
             except ValueError as ex:
                 # Make sure the exception was due to an unclosed quote and
                 # we haven't exhausted the closing quotes to try
-                if str(ex) == "No closing quotation" and quotes_to_try:
+                if str(ex) == "No closing quotation" and quote_index < len(constants.QUOTES):
                     # Add a closing quote and try to parse again
-                    unclosed_quote = quotes_to_try[0]
-                    quotes_to_try = quotes_to_try[1:]
+                    unclosed_quote = constants.QUOTES[quote_index]
+                    quote_index += 1
 
                     tmp_line = line[:endidx]
                     tmp_line += unclosed_quote
@@ -888,21 +1014,28 @@ class Cmd(cmd.Cmd):
 
             # Get the common beginning for the matches
             common_prefix = os.path.commonprefix(matches)
-            prefix_tokens = common_prefix.split(delimiter)
 
             # Calculate what portion of the match we are completing
-            display_token_index = 0
-            if prefix_tokens:
-                display_token_index = len(prefix_tokens) - 1
+            display_token_index = common_prefix.count(delimiter)
+
+            # Every match begins with common_prefix, so this portion starts at the same offset in each of them
+            token_start = 0
+            for _ in range(display_token_index):
+                token_start = common_prefix.find(delimiter, token_start) + len(delimiter)
 
             # Get this portion for each match and store them in self.display_matches
+            display_matches = []
             for cur_match in matches:
-                match_tokens = cur_match.split(delimiter)
-                display_token = match_tokens[display_token_index]
+                token_end = cur_match.find(delimiter, token_start)
+                if token_end == -1:
+                    token_end = len(cur_match)
 
+                display_token = cur_match[token_start:token_end]
                 if not display_token:
                     display_token = delimiter
-                self.display_matches.append(display_token)
+                display_matches.append(display_token)
+
+            self.display_matches.extend(display_matches)
 
         return matches
 
@@ -938,14 +1071,14 @@ class Cmd(cmd.Cmd):
             if flag in flag_dict:
                 match_against = flag_dict[flag]
 
-        # Perform tab completion using an Iterable
-        if isinstance(match_against, Iterable):
-            completions_matches = utils.basic_complete(text, line, begidx, endidx, match_against)
-
         # Perform tab completion using a function
-        elif callable(match_against):
+        if callable(match_against):
             completions_matches = match_against(text, line, begidx, endidx)
 
+        # Perform tab completion using an Iterable
+        elif match_against is not None:
+            completions_matches = utils.basic_complete(text, line, begidx, endidx, match_against)
+
         return completions_matches
 
     def index_based_complete(self, text: str, line: str, begidx: int, endidx: int,
@@ -982,16 +1115,55 @@ class Cmd(cmd.Cmd):
         else:
             match_against = all_else
 
-        # Perform tab completion using a Iterable
-        if isinstance(match_against, Iterable):
-            matches = utils.basic_complete(text, line, begidx, endidx, match_against)
-
         # Perform tab completion using a function
-        elif callable(match_against):
+        if callable(match_against):
             matches = match_against(text, line, begidx, endidx)
 
+        # Perform tab completion using an Iterable
+        elif match_against is not None:
+            matches = utils.basic_complete(text, line, begidx, endidx, match_against)
+
         return matches
 
+    @staticmethod
+    def _scandir_matches(search_str: str,
+                         path_filter: Optional[Callable[[str], bool]]) -> Tuple[List[str], Set[str]]:
+        """Find the paths that start with search_str. This matches the same paths as glob.glob(search_str + '*'),
+        except the text is taken literally and scandir() tells us which entries are directories.
+
+        :param search_str: the path prefix being completed
+        :param path_filter: optional filter function that determines if a path belongs in the results
+        :return: a tuple of the matching paths and the set of those paths which are directories
+        """
+        search_dir, search_prefix = os.path.split(search_str)
+        norm_prefix = os.path.normcase(search_prefix)
+        include_hidden = search_prefix.startswith('.')
+
+        matches = []
+        dir_matches = set()
+
+        try:
+            for entry in os.scandir(search_dir or os.curdir):
+                if not os.path.normcase(entry.name).startswith(norm_prefix):
+                    continue
+                if entry.name.startswith('.') and not include_hidden:
+                    continue
+
+                cur_path = os.path.join(search_dir, entry.name)
+
+                # Filter out results that don't belong
+                if path_filter is not None and not path_filter(cur_path):
+                    continue
+
+                matches.append(cur_path)
+                if entry.is_dir():
+                    dir_matches.add(cur_path)
+        except OSError:
+            # The directory doesn't exist or can't be read
+            pass
+
+        return matches, dir_matches
+
     # noinspection PyUnusedLocal
     def path_complete(self, text: str, line: str, begidx: int, endidx: int, *,
                       path_filter: Optional[Callable[[str], bool]] = None) -> List[str]:
@@ -1020,7 +1192,7 @@ class Cmd(cmd.Cmd):
             # Windows lacks the pwd module so we can't get a list of users.
             # Instead we will return a result once the user enters text that
             # resolves to an existing home directory.
-            if sys.platform.startswith('win'):
+            if sys.platform == 'win32':
                 expanded_path = os.path.expanduser(text)
                 if os.path.isdir(expanded_path):
                     user = text
@@ -1028,26 +1200,25 @@ class Cmd(cmd.Cmd):
                         user += os.path.sep
                     users.append(user)
             else:
-                import pwd
-
-                # Iterate through a list of users from the password database
-                for cur_pw in pwd.getpwall():
-
-                    # Check if the user has an existing home dir
-                    if os.path.isdir(cur_pw.pw_dir):
-
-                        # Add a ~ to the user to match against text
-                        cur_user = '~' + cur_pw.pw_name
-                        if cur_user.startswith(text):
-                            if add_trailing_sep_if_dir:
-                                cur_user += os.path.sep
-                            users.append(cur_user)
+                cur_time = time.monotonic()
+                if self._home_dir_users is None or cur_time - self._home_dir_users_time > _USER_CACHE_TIMEOUT:
+                    # Add a ~ to each user in the password database who has an existing home dir
+                    self._home_dir_users = ['~' + cur_pw.pw_name for cur_pw in pwd.getpwall()
+                                            if os.path.isdir(cur_pw.pw_dir)]
+                    self._home_dir_users_time = cur_time
+
+                for cur_user in self._home_dir_users:
+                    if cur_user.startswith(text):
+                        if add_trailing_sep_if_dir:
+                            cur_user += os.path.sep
+                        users.append(cur_user)
 
             return users
 
         # Determine if a trailing separator should be appended to directory completions
         add_trailing_sep_if_dir = False
-        if endidx == len(line) or (endidx < len(line) and line[endidx] != os.path.sep):
+        line_len = len(line)
+        if endidx == line_len or (endidx < line_len and line[endidx] != os.path.sep):
             add_trailing_sep_if_dir = True
 
         # Used to replace cwd in the final results
@@ -1058,19 +1229,17 @@ class Cmd(cmd.Cmd):
         orig_tilde_path = ''
         expanded_tilde_path = ''
 
-        # If the search text is blank, then search in the CWD for *
+        # If the search text is blank, then search in the CWD for everything
         if not text:
-            search_str = os.path.join(os.getcwd(), '*')
+            search_str = os.path.join(cwd, '')
             cwd_added = True
         else:
             # Purposely don't match any path containing wildcards
-            wildcards = ['*', '?']
-            for wildcard in wildcards:
-                if wildcard in text:
-                    return []
+            if not _PATH_WILDCARDS.isdisjoint(text):
+                return []
 
             # Start the search string
-            search_str = text + '*'
+            search_str = text
 
             # Handle tilde expansion and completion
             if text.startswith('~'):
@@ -1090,21 +1259,17 @@ class Cmd(cmd.Cmd):
 
             # If the search text does not have a directory, then use the cwd
             elif not os.path.dirname(text):
-                search_str = os.path.join(os.getcwd(), search_str)
+                search_str = os.path.join(cwd, search_str)
                 cwd_added = True
 
         # Set this to True for proper quoting of paths with spaces
         self.matches_delimited = True
 
         # Find all matching path completions
-        matches = glob.glob(search_str)
-
-        # Filter out results that don't belong
-        if path_filter is not None:
-            matches = [c for c in matches if path_filter(c)]
+        matches, dir_matches = self._scandir_matches(search_str, path_filter)
 
         # Don't append a space or closing quote to directory
-        if len(matches) == 1 and os.path.isdir(matches[0]):
+        if len(matches) == 1 and matches[0] in dir_matches:
             self.allow_appended_space = False
             self.allow_closing_quote = False
 
@@ -1113,15 +1278,20 @@ class Cmd(cmd.Cmd):
         self.matches_sorted = True
 
         # Build display_matches and add a slash to directories
+        display_matches = []
         for index, cur_match in enumerate(matches):
 
             # Display only the basename of this path in the tab-completion suggestions
-            self.display_matches.append(os.path.basename(cur_match))
+            display_match = os.path.basename(cur_match)
 
             # Add a separator after directories if the next character isn't already a separator
-            if os.path.isdir(cur_match) and add_trailing_sep_if_dir:
+            if add_trailing_sep_if_dir and cur_match in dir_matches:
                 matches[index] += os.path.sep
-                self.display_matches[index] += os.path.sep
+                display_match += os.path.sep
+
+            display_matches.append(display_match)
+
+        self.display_matches.extend(display_matches)
 
         # Remove cwd if it was added to match the text readline expects
         if cwd_added:
@@ -1129,11 +1299,15 @@ class Cmd(cmd.Cmd):
                 to_replace = cwd
             else:
                 to_replace = cwd + os.path.sep
-            matches = [cur_path.replace(to_replace, '', 1) for cur_path in matches]
+            prefix_len = len(to_replace)
+            matches = [cur_path[prefix_len:] if cur_path.startswith(to_replace) else cur_path
+                       for cur_path in matches]
 
         # Restore the tilde string if we expanded one to match the text readline expects
         if expanded_tilde_path:
-            matches = [cur_path.replace(expanded_tilde_path, orig_tilde_path, 1) for cur_path in matches]
+            prefix_len = len(expanded_tilde_path)
+            matches = [orig_tilde_path + cur_path[prefix_len:] if cur_path.startswith(expanded_tilde_path)
+                       else cur_path for cur_path in matches]
 
         return matches
 
@@ -1181,11 +1355,9 @@ class Cmd(cmd.Cmd):
         if not raw_tokens:
             return []
 
-        # Must at least have the command
-        if len(raw_tokens) > 1:
-
-            # True when command line contains any redirection tokens
-            has_redirection = False
+        # Must at least have the command. Most command lines have no redirection,
+        # so don't bother examining the tokens unless there is some.
+        if len(raw_tokens) > 1 and not _REDIRECTION_TOKEN_SET.isdisjoint(raw_tokens):
 
             # Keep track of state while examining tokens
             in_pipe = False
@@ -1196,9 +1368,7 @@ class Cmd(cmd.Cmd):
 
             for cur_token in raw_tokens:
                 # Process redirection tokens
-                if cur_token in constants.REDIRECTION_TOKENS:
-                    has_redirection = True
-
+                if cur_token in _REDIRECTION_TOKEN_SET:
                     # Check if we are at a pipe
                     if cur_token == constants.REDIRECTION_PIPE:
                         # Do not complete bad syntax (e.g cmd | |)
@@ -1210,7 +1380,7 @@ class Cmd(cmd.Cmd):
 
                     # Otherwise this is a file redirection token
                     else:
-                        if prior_token in constants.REDIRECTION_TOKENS or in_file_redir:
+                        if prior_token in _REDIRECTION_TOKEN_SET or in_file_redir:
                             # Do not complete bad syntax (e.g cmd | >) (e.g cmd > blah >)
                             return []
 
@@ -1224,7 +1394,7 @@ class Cmd(cmd.Cmd):
 
                     if prior_token == constants.REDIRECTION_PIPE:
                         do_shell_completion = True
-                    elif in_pipe or prior_token in (constants.REDIRECTION_OUTPUT, constants.REDIRECTION_APPEND):
+                    elif in_pipe or prior_token in _FILE_REDIRECTION_TOKEN_SET:
                         do_path_completion = True
 
                 prior_token = cur_token
@@ -1235,10 +1405,9 @@ class Cmd(cmd.Cmd):
             elif do_path_completion:
                 return self.path_complete(text, line, begidx, endidx)
 
-            # If there were redirection strings anywhere on the command line, then we
+            # Since there were redirection strings on the command line, we
             # are no longer tab completing for the current command
-            elif has_redirection:
-                return []
+            return []
 
         # Call the command's completer function
         return compfunc(text, line, begidx, endidx)
@@ -1294,19 +1463,19 @@ class Cmd(cmd.Cmd):
             matches_to_display, padding_length = self._pad_matches_to_display(matches_to_display)
             longest_match_length += padding_length
 
-            # We will use readline's display function (rl_display_match_list()), so we
-            # need to encode our string as bytes to place in a C array.
-            encoded_substitution = bytes(substitution, encoding='utf-8')
-            encoded_matches = [bytes(cur_match, encoding='utf-8') for cur_match in matches_to_display]
-
             # rl_display_match_list() expects matches to be in argv format where
             # substitution is the first element, followed by the matches, and then a NULL.
+            num_matches = len(matches_to_display)
             # noinspection PyCallingNonCallable,PyTypeChecker
-            strings_array = (ctypes.c_char_p * (1 + len(encoded_matches) + 1))()
+            strings_array = (ctypes.c_char_p * (1 + num_matches + 1))()
+
+            # We will use readline's display function (rl_display_match_list()), so we
+            # need to encode our strings as bytes to place in the C array.
+            strings_array[0] = substitution.encode('utf-8')
+            for index, cur_match in enumerate(matches_to_display, start=1):
+                strings_array[index] = cur_match.encode('utf-8')
 
-            # Copy in the encoded strings and add a NULL to the end
-            strings_array[0] = encoded_substitution
-            strings_array[1:-1] = encoded_matches
+            # Add a NULL to the end
             strings_array[-1] = None
 
             # Print the header if one exists
@@ -1315,7 +1484,7 @@ class Cmd(cmd.Cmd):
 
             # Call readline's display function
             # rl_display_match_list(strings_array, number of completion matches, longest match length)
-            readline_lib.rl_display_match_list(strings_array, len(encoded_matches), longest_match_length)
+            readline_lib.rl_display_match_list(strings_array, num_matches, longest_match_length)
 
             # Redraw prompt and input line
             rl_force_redisplay()
@@ -1404,7 +1573,7 @@ class Cmd(cmd.Cmd):
             # we want to complete. Figure out where that token actually begins and save the beginning
             # portion of it that was not part of the text readline gave us. We will remove it from the
             # completions later since readline expects them to start with the original text.
-            actual_begidx = line[:endidx].rfind(tokens[-1])
+            actual_begidx = line.rfind(tokens[-1], 0, endidx)
 
             if actual_begidx != begidx:
                 text_to_remove = line[actual_begidx:begidx]
@@ -1414,22 +1583,23 @@ class Cmd(cmd.Cmd):
                 text = text_to_remove + text
                 begidx = actual_begidx
 
+        # Look up the command's function the same way onecmd() does
+        func = self.cmd_func(command)
+
         # Check if a macro was entered
         if command in self.macros:
             compfunc = self.path_complete
 
         # Check if a command was entered
-        elif command in self.get_all_commands():
+        elif func is not None:
             # Get the completer function for this command
             compfunc = getattr(self, COMPLETER_FUNC_PREFIX + command, None)
 
             if compfunc is None:
                 # There's no completer function, next see if the command uses argparse
-                func = self.cmd_func(command)
-                argparser = getattr(func, CMD_ATTR_ARGPARSER, None)
+                argparser = _get_argparser(func)
 
-                if func is not None and argparser is not None:
-                    import functools
+                if argparser is not None:
                     compfunc = functools.partial(self._autocomplete_default,
                                                  argparser=argparser)
                 else:
@@ -1438,7 +1608,7 @@ class Cmd(cmd.Cmd):
         # Not a recognized macro or command
         else:
             # Check if this command should be run as a shell command
-            if self.default_to_shell and command in utils.get_exes_in_path(command):
+            if self.default_to_shell and shutil.which(command) is not None:
                 compfunc = self.path_complete
             else:
                 compfunc = self.completedefault
@@ -1457,8 +1627,12 @@ class Cmd(cmd.Cmd):
                 # Since self.display_matches is empty, set it to self.completion_matches
                 # before we alter them. That way the suggestions will reflect how we parsed
                 # the token being completed and not how readline did.
-                import copy
-                self.display_matches = copy.copy(self.completion_matches)
+                self.display_matches = list(self.completion_matches)
+
+            # Text to prepend to and remove from the start of each tab completion.
+            # These are applied in a single pass once we know what they are.
+            match_prefix = shortcut_to_restore
+            match_text_to_remove = ''
 
             # Check if we need to add an opening quote
             if not unclosed_quote:
@@ -1469,13 +1643,14 @@ class Cmd(cmd.Cmd):
                 common_prefix = os.path.commonprefix(self.completion_matches)
 
                 if self.matches_delimited:
-                    # Check if any portion of the display matches appears in the tab completion
-                    display_prefix = os.path.commonprefix(self.display_matches)
-
                     # For delimited matches, we check for a space in what appears before the display
                     # matches (common_prefix) as well as in the display matches themselves.
-                    if ' ' in common_prefix or (display_prefix
-                                                and any(' ' in match for match in self.display_matches)):
+                    if ' ' in common_prefix:
+                        add_quote = True
+
+                    # Check if any portion of the display matches appears in the tab completion
+                    elif os.path.commonprefix(self.display_matches) and \
+                            any(' ' in match for match in self.display_matches):
                         add_quote = True
 
                 # If there is a tab completion and any match has a space, then add an opening quote
@@ -1489,16 +1664,18 @@ class Cmd(cmd.Cmd):
                     else:
                         unclosed_quote = '"'
 
-                    self.completion_matches = [unclosed_quote + match for match in self.completion_matches]
+                    match_prefix += unclosed_quote
 
             # Check if we need to remove text from the beginning of tab completions
             elif text_to_remove:
-                self.completion_matches = [match.replace(text_to_remove, '', 1) for match in self.completion_matches]
+                match_text_to_remove = text_to_remove
 
-            # Check if we need to restore a shortcut in the tab completions
-            # so it doesn't get erased from the command line
-            if shortcut_to_restore:
-                self.completion_matches = [shortcut_to_restore + match for match in self.completion_matches]
+            # The prefix restores any shortcut so it doesn't get erased from the command line
+            if match_text_to_remove:
+                self.completion_matches = [match_prefix + match.replace(match_text_to_remove, '', 1)
+                                           for match in self.completion_matches]
+            elif match_prefix:
+                self.completion_matches = [match_prefix + match for match in self.completion_matches]
 
             # If we have one result, then add a closing quote if needed and allowed
             if len(self.completion_matches) == 1 and self.allow_closing_quote and unclosed_quote:
@@ -1573,8 +1750,14 @@ class Cmd(cmd.Cmd):
 
                 # Sort matches if they haven't already been sorted
                 if not self.matches_sorted:
+                    # The display matches are often a copy of the completion matches. Only sort those once.
+                    display_is_copy = self.display_matches == self.completion_matches
                     self.completion_matches.sort(key=self.default_sort_key)
-                    self.display_matches.sort(key=self.default_sort_key)
+
+                    if display_is_copy:
+                        self.display_matches = list(self.completion_matches)
+                    else:
+                        self.display_matches.sort(key=self.default_sort_key)
                     self.matches_sorted = True
 
             try:
@@ -1596,26 +1779,60 @@ class Cmd(cmd.Cmd):
         tokens, _ = self.tokens_for_completion(line, begidx, endidx)
         return completer.complete_command(tokens, text, line, begidx, endidx)
 
+    def _validate_command_names(self) -> None:
+        """Raise a ValueError if any command has an invalid name (like starting with a shortcut).
+
+        Command functions are defined on the class and a name's validity only depends on the shortcuts
+        and terminators. Therefore the check is skipped if this class already passed it with the same
+        shortcuts and terminators. Commands added to the class after its first instantiation are not
+        validated again for those settings.
+        """
+        cls = type(self)
+
+        # Look in this class's own namespace so subclasses don't share their parent's record
+        validated_settings = cls.__dict__.get('_validated_command_name_settings')
+        if validated_settings is None:
+            validated_settings = set()
+            cls._validated_command_name_settings = validated_settings
+
+        settings = (self.statement_parser.shortcuts, self.statement_parser.terminators)
+        if settings in validated_settings:
+            return
+
+        for cur_cmd in self.get_all_commands():
+            valid, errmsg = self.statement_parser.is_valid_command(cur_cmd)
+            if not valid:
+                raise ValueError("Invalid command name {!r}: {}".format(cur_cmd, errmsg))
+
+        validated_settings.add(settings)
+
+    def _get_func_names(self, prefix: str) -> List[str]:
+        """Return the names of this class's attributes which start with a prefix like COMMAND_FUNC_PREFIX.
+
+        This gives the same names as filtering get_names(), but only sorts the ones with the prefix instead of
+        all of dir(). The class dictionaries are read on every call, so attributes added, removed, or renamed
+        at runtime are always reflected.
+
+        :param prefix: the prefix the attribute names start with
+        """
+        cls = type(self)
+
+        # Honor a subclass which has changed how names are found
+        if cls.get_names is not cmd.Cmd.get_names:
+            return [name for name in self.get_names() if name.startswith(prefix)]
+
+        return sorted({name for cur_cls in cls.__mro__ for name in vars(cur_cls) if name.startswith(prefix)})
+
     def get_all_commands(self) -> List[str]:
         """Return a list of all commands"""
-        return [name[len(COMMAND_FUNC_PREFIX):] for name in self.get_names()
-                if name.startswith(COMMAND_FUNC_PREFIX) and callable(getattr(self, name))]
+        return [name[len(COMMAND_FUNC_PREFIX):] for name in self._get_func_names(COMMAND_FUNC_PREFIX)
+                if callable(getattr(self, name))]
 
     def get_visible_commands(self) -> List[str]:
         """Return a list of commands that have not been hidden or disabled"""
-        commands = self.get_all_commands()
-
-        # Remove the hidden commands
-        for name in self.hidden_commands:
-            if name in commands:
-                commands.remove(name)
-
-        # Remove the disabled commands
-        for name in self.disabled_commands:
-            if name in commands:
-                commands.remove(name)
-
-        return commands
+        hidden_commands = set(self.hidden_commands)
+        return [command for command in self.get_all_commands()
+                if command not in hidden_commands and command not in self.disabled_commands]
 
     def _get_alias_completion_items(self) -> List[CompletionItem]:
         """Return list of current alias names and values as CompletionItems"""
@@ -1631,15 +1848,15 @@ class Cmd(cmd.Cmd):
 
     def _get_commands_aliases_and_macros_for_completion(self) -> List[str]:
         """Return a list of visible commands, aliases, and macros for tab completion"""
-        visible_commands = set(self.get_visible_commands())
-        alias_names = set(self.aliases)
-        macro_names = set(self.macros)
-        return list(visible_commands | alias_names | macro_names)
+        names = set(self.get_visible_commands())
+        names.update(self.aliases)
+        names.update(self.macros)
+        return list(names)
 
     def get_help_topics(self) -> List[str]:
         """ Returns a list of help topics """
-        return [name[len(HELP_FUNC_PREFIX):] for name in self.get_names()
-                if name.startswith(HELP_FUNC_PREFIX) and callable(getattr(self, name))]
+        return [name[len(HELP_FUNC_PREFIX):] for name in self._get_func_names(HELP_FUNC_PREFIX)
+                if callable(getattr(self, name))]
 
     # noinspection PyUnusedLocal
     def sigint_handler(self, signum: int, frame) -> None:
@@ -1689,8 +1906,6 @@ class Cmd(cmd.Cmd):
                                command's stdout.
         :return: True if running of commands should stop
         """
-        import datetime
-
         stop = False
         try:
             statement = self._input_line_to_statement(line)
@@ -1703,19 +1918,20 @@ class Cmd(cmd.Cmd):
 
         # now that we have a statement, run it with all the hooks
         try:
-            # call the postparsing hooks
-            data = plugin.PostparsingData(False, statement)
-            for func in self._postparsing_hooks:
-                data = func(data)
-                if data.stop:
-                    break
-            # unpack the data object
-            statement = data.statement
-            stop = data.stop
-            if stop:
-                # we should not run the command, but
-                # we need to run the finalization hooks
-                raise EmptyStatement
+            # call the postparsing hooks (most apps have none, so skip creating the data object)
+            if self._postparsing_hooks:
+                data = plugin.PostparsingData(False, statement)
+                for func in self._postparsing_hooks:
+                    data = func(data)
+                    if data.stop:
+                        break
+                # unpack the data object
+                statement = data.statement
+                stop = data.stop
+                if stop:
+                    # we should not run the command, but
+                    # we need to run the finalization hooks
+                    raise EmptyStatement
 
             # Keep track of whether or not we were already _redirecting before this command
             already_redirecting = self._redirecting
@@ -1739,13 +1955,16 @@ class Cmd(cmd.Cmd):
                     if not already_redirecting:
                         self._redirecting = saved_state.redirecting
 
-                    timestart = datetime.datetime.now()
+                    # perf_counter() is much cheaper than datetime.now(). The start time is recorded even when
+                    # timing is off since the command might turn it on.
+                    timestart = time.perf_counter()
 
                     # precommand hooks
-                    data = plugin.PrecommandData(statement)
-                    for func in self._precmd_hooks:
-                        data = func(data)
-                    statement = data.statement
+                    if self._precmd_hooks:
+                        data = plugin.PrecommandData(statement)
+                        for func in self._precmd_hooks:
+                            data = func(data)
+                        statement = data.statement
 
                     # call precmd() for compatibility with cmd.Cmd
                     statement = self.precmd(statement)
@@ -1754,18 +1973,20 @@ class Cmd(cmd.Cmd):
                     stop = self.onecmd(statement, add_to_history=add_to_history)
 
                     # postcommand hooks
-                    data = plugin.PostcommandData(stop, statement)
-                    for func in self._postcmd_hooks:
-                        data = func(data)
+                    if self._postcmd_hooks:
+                        data = plugin.PostcommandData(stop, statement)
+                        for func in self._postcmd_hooks:
+                            data = func(data)
 
-                    # retrieve the final value of stop, ignoring any statement modification from the hooks
-                    stop = data.stop
+                        # retrieve the final value of stop, ignoring any statement modification from the hooks
+                        stop = data.stop
 
                     # call postcmd() for compatibility with cmd.Cmd
                     stop = self.postcmd(stop, statement)
 
                     if self.timing:
-                        self.pfeedback('Elapsed: {}'.format(datetime.datetime.now() - timestart))
+                        elapsed = datetime.timedelta(seconds=time.perf_counter() - timestart)
+                        self.pfeedback('Elapsed: {}'.format(elapsed))
             finally:
                 # Get sigint protection while we restore stuff
                 with self.sigint_protection:
@@ -1791,12 +2012,23 @@ class Cmd(cmd.Cmd):
         """Run the command finalization hooks"""
 
         with self.sigint_protection:
-            if not sys.platform.startswith('win') and self.stdout.isatty():
+            if sys.platform != 'win32' and self.stdout.isatty():
                 # Before the next command runs, fix any terminal problems like those
                 # caused by certain binary characters having been printed to it.
-                import subprocess
-                proc = subprocess.Popen(['stty', 'sane'])
-                proc.communicate()
+                restored = False
+                if self._saved_termios is not None:
+                    try:
+                        termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, self._saved_termios)
+                        restored = True
+                    except (termios.error, OSError):  # pragma: no cover
+                        pass
+
+                if not restored:
+                    proc = subprocess.Popen(['stty', 'sane'])
+                    proc.communicate()
+
+        if not self._cmdfinalization_hooks:
+            return stop
 
         try:
             data = plugin.CommandFinalizationData(stop, statement)
@@ -1822,7 +2054,7 @@ class Cmd(cmd.Cmd):
                 line = line.raw
 
             if self.echo:
-                self.poutput('{}{}'.format(self.prompt, line))
+                self.poutput(self.prompt + line)
 
             if self.onecmd_plus_hooks(line, add_to_history=add_to_history):
                 return True
@@ -1875,7 +2107,7 @@ class Cmd(cmd.Cmd):
                     # terminator
                     nextline = '\n'
                     self.poutput(nextline)
-                line = '{}{}'.format(self._multiline_in_progress, nextline)
+                line = self._multiline_in_progress + nextline
             except KeyboardInterrupt as ex:
                 if self.quit_on_sigint:
                     raise ex
@@ -1897,7 +2129,11 @@ class Cmd(cmd.Cmd):
         :param line: the line being parsed
         :return: parsed command line as a Statement
         """
-        used_macros = []
+        # There is nothing to resolve if no macros exist
+        if not self.macros:
+            return self._complete_statement(line)
+
+        used_macros = set()
         orig_line = None
 
         # Continue until all macros are resolved
@@ -1910,8 +2146,8 @@ class Cmd(cmd.Cmd):
                 orig_line = statement.raw
 
             # Check if this command matches a macro and wasn't already processed to avoid an infinite loop
-            if statement.command in self.macros.keys() and statement.command not in used_macros:
-                used_macros.append(statement.command)
+            if statement.command in self.macros and statement.command not in used_macros:
+                used_macros.add(statement.command)
                 line = self._resolve_macro(statement)
                 if line is None:
                     raise EmptyStatement()
@@ -1941,7 +2177,7 @@ class Cmd(cmd.Cmd):
         :param statement: the parsed statement from the command line
         :return: the resolved macro or None on error
         """
-        if statement.command not in self.macros.keys():
+        if statement.command not in self.macros:
             raise KeyError('{} is not a macro'.format(statement.command))
 
         macro = self.macros[statement.command]
@@ -1956,28 +2192,34 @@ class Cmd(cmd.Cmd):
             )
             return None
 
-        # Resolve the arguments in reverse and read their values from statement.argv since those
-        # are unquoted. Macro args should have been quoted when the macro was created.
-        resolved = macro.value
-        reverse_arg_list = sorted(macro.arg_list, key=lambda ma: ma.start_index, reverse=True)
+        # Build the resolved string from the text between the arguments and the arguments' replacements.
+        # Read argument values from statement.argv since those are unquoted. Macro args should have been
+        # quoted when the macro was created.
+        resolved_parts = []
+        prev_end = 0
 
-        for arg in reverse_arg_list:
+        for arg in sorted(macro.arg_list, key=lambda ma: ma.start_index):
             if arg.is_escaped:
-                to_replace = '{{' + arg.number_str + '}}'
+                # Strip one set of braces from {{number}}
+                to_replace_len = len(arg.number_str) + 4
                 replacement = '{' + arg.number_str + '}'
             else:
-                to_replace = '{' + arg.number_str + '}'
+                to_replace_len = len(arg.number_str) + 2
                 replacement = statement.argv[int(arg.number_str)]
 
-            parts = resolved.rsplit(to_replace, maxsplit=1)
-            resolved = parts[0] + replacement + parts[1]
+            resolved_parts.append(macro.value[prev_end:arg.start_index])
+            resolved_parts.append(replacement)
+            prev_end = arg.start_index + to_replace_len
+
+        resolved_parts.append(macro.value[prev_end:])
 
         # Append extra arguments and use statement.arg_list since these arguments need their quotes preserved
         for arg in statement.arg_list[macro.minimum_arg_count:]:
-            resolved += ' ' + arg
+            resolved_parts.append(' ' + arg)
 
         # Restore any terminator, suffix, redirection, etc.
-        return resolved + statement.post_command
+        resolved_parts.append(statement.post_command)
+        return ''.join(resolved_parts)
 
     def _redirect_output(self, statement: Statement) -> Tuple[bool, utils.RedirectionSavedState]:
         """Handles output redirection for >, >>, and |.
@@ -1986,7 +2228,6 @@ class Cmd(cmd.Cmd):
         :return: A bool telling if an error occurred and a utils.RedirectionSavedState object
         """
         import io
-        import subprocess
 
         redir_error = False
 
@@ -2000,9 +2241,10 @@ class Cmd(cmd.Cmd):
             # Create a pipe with read and write sides
             read_fd, write_fd = os.pipe()
 
-            # Open each side of the pipe
+            # Open each side of the pipe. Commands can send a lot of output through the pipe, so
+            # buffer up to a typical pipe's capacity (64 KiB) per write instead of the default 8 KiB.
             subproc_stdin = io.open(read_fd, 'r')
-            new_stdout = io.open(write_fd, 'w')
+            new_stdout = io.open(write_fd, 'w', buffering=8 * io.DEFAULT_BUFFER_SIZE)
 
             # Set options to not forward signals to the pipe process. If a Ctrl-C event occurs,
             # our sigint handler will forward it only to the most recent pipe process. This makes
@@ -2141,8 +2383,8 @@ class Cmd(cmd.Cmd):
         func = self.cmd_func(statement.command)
         if func:
             # Check to see if this command should be stored in history
-            if statement.command not in self.exclude_from_history and \
-                    statement.command not in self.disabled_commands and add_to_history:
+            if add_to_history and statement.command not in self.exclude_from_history and \
+                    statement.command not in self.disabled_commands:
 
                 self.history.append(statement)
 
@@ -2181,8 +2423,10 @@ class Cmd(cmd.Cmd):
           to decide whether to print the prompt and the input
         """
         if self.use_rawinput:
+            # Check once so the terminal lock is reacquired only if it was released
+            stdin_is_tty = sys.stdin.isatty()
             try:
-                if sys.stdin.isatty():
+                if stdin_is_tty:
                     # Wrap in try since terminal_lock may not be locked when this function is called from unit tests
                     try:
                         # A prompt is about to be drawn. Allow asynchronous changes to the terminal.
@@ -2196,11 +2440,11 @@ class Cmd(cmd.Cmd):
                 else:
                     line = input()
                     if self.echo:
-                        sys.stdout.write('{}{}\n'.format(prompt, line))
+                        sys.stdout.write(prompt + line + '\n')
             except EOFError:
                 line = 'eof'
             finally:
-                if sys.stdin.isatty():
+                if stdin_is_tty:
                     # The prompt is gone. Do not allow asynchronous changes to the terminal.
                     self.terminal_lock.acquire()
         else:
@@ -2219,7 +2463,7 @@ class Cmd(cmd.Cmd):
                 if len(line):
                     # we read something, output the prompt and the something
                     if self.echo:
-                        self.poutput('{}{}'.format(prompt, line))
+                        self.poutput(prompt + line)
                 else:
                     line = 'eof'
 
@@ -2233,6 +2477,7 @@ class Cmd(cmd.Cmd):
         readline_settings = _SavedReadlineSettings()
 
         if self.use_rawinput and self.completekey and rl_type != RlType.NONE:
+            _init_readline_state()
 
             # Set up readline for our tab completion needs
             if rl_type == RlType.GNU:
@@ -2334,8 +2579,7 @@ class Cmd(cmd.Cmd):
             return
 
         # Unquote redirection and terminator tokens
-        tokens_to_unquote = constants.REDIRECTION_TOKENS
-        tokens_to_unquote.extend(self.statement_parser.terminators)
+        tokens_to_unquote = constants.REDIRECTION_TOKENS + list(self.statement_parser.terminators)
         utils.unquote_specific_tokens(args.command_args, tokens_to_unquote)
 
         # Build the alias value string
@@ -2371,9 +2615,10 @@ class Cmd(cmd.Cmd):
                     self.poutput("alias create {} {}".format(cur_name, self.aliases[cur_name]))
                 else:
                     self.perror("Alias '{}' not found".format(cur_name))
-        else:
-            for cur_alias in sorted(self.aliases, key=self.default_sort_key):
-                self.poutput("alias create {} {}".format(cur_alias, self.aliases[cur_alias]))
+        elif self.aliases:
+            # Write all aliases at once
+            self.poutput('\n'.join("alias create {} {}".format(cur_alias, self.aliases[cur_alias])
+                                   for cur_alias in sorted(self.aliases, key=self.default_sort_key)))
 
     # Top-level parser for alias
     alias_description = ("Manage aliases\n"
@@ -2467,8 +2712,7 @@ class Cmd(cmd.Cmd):
             return
 
         # Unquote redirection and terminator tokens
-        tokens_to_unquote = constants.REDIRECTION_TOKENS
-        tokens_to_unquote.extend(self.statement_parser.terminators)
+        tokens_to_unquote = constants.REDIRECTION_TOKENS + list(self.statement_parser.terminators)
         utils.unquote_specific_tokens(args.command_args, tokens_to_unquote)
 
         # Build the macro value string
@@ -2478,29 +2722,22 @@ class Cmd(cmd.Cmd):
 
         # Find all normal arguments
         arg_list = []
-        normal_matches = re.finditer(MacroArg.macro_normal_arg_pattern, value)
         max_arg_num = 0
         arg_nums = set()
 
-        while True:
-            try:
-                cur_match = normal_matches.__next__()
-
-                # Get the number string between the braces
-                cur_num_str = (re.findall(MacroArg.digit_pattern, cur_match.group())[0])
-                cur_num = int(cur_num_str)
-                if cur_num < 1:
-                    self.perror("Argument numbers must be greater than 0")
-                    return
-
-                arg_nums.add(cur_num)
-                if cur_num > max_arg_num:
-                    max_arg_num = cur_num
+        for cur_match in MacroArg.macro_normal_arg_pattern.finditer(value):
+            # Get the number string between the braces. The match is exactly {number}.
+            cur_num_str = cur_match.group()[1:-1]
+            cur_num = int(cur_num_str)
+            if cur_num < 1:
+                self.perror("Argument numbers must be greater than 0")
+                return
 
-                arg_list.append(MacroArg(start_index=cur_match.start(), number_str=cur_num_str, is_escaped=False))
+            arg_nums.add(cur_num)
+            if cur_num > max_arg_num:
+                max_arg_num = cur_num
 
-            except StopIteration:
-                break
+            arg_list.append(MacroArg(start_index=cur_match.start(), number_str=cur_num_str, is_escaped=False))
 
         # Make sure the argument numbers are continuous
         if len(arg_nums) != max_arg_num:
@@ -2510,18 +2747,10 @@ class Cmd(cmd.Cmd):
             return
 
         # Find all escaped arguments
-        escaped_matches = re.finditer(MacroArg.macro_escaped_arg_pattern, value)
-
-        while True:
-            try:
-                cur_match = escaped_matches.__next__()
-
-                # Get the number string between the braces
-                cur_num_str = re.findall(MacroArg.digit_pattern, cur_match.group())[0]
-
-                arg_list.append(MacroArg(start_index=cur_match.start(), number_str=cur_num_str, is_escaped=True))
-            except StopIteration:
-                break
+        for cur_match in MacroArg.macro_escaped_arg_pattern.finditer(value):
+            # Get the number string between the braces. The match is exactly {{number}}.
+            cur_num_str = cur_match.group()[2:-2]
+            arg_list.append(MacroArg(start_index=cur_match.start(), number_str=cur_num_str, is_escaped=True))
 
         # Set the macro
         result = "overwritten" if args.name in self.macros else "created"
@@ -2551,9 +2780,10 @@ class Cmd(cmd.Cmd):
                     self.poutput("macro create {} {}".format(cur_name, self.macros[cur_name].value))
                 else:
                     self.perror("Macro '{}' not found".format(cur_name))
-        else:
-            for cur_macro in sorted(self.macros, key=self.default_sort_key):
-                self.poutput("macro create {} {}".format(cur_macro, self.macros[cur_macro].value))
+        elif self.macros:
+            # Write all macros at once
+            self.poutput('\n'.join("macro create {} {}".format(cur_macro, self.macros[cur_macro].value)
+                                   for cur_macro in sorted(self.macros, key=self.default_sort_key)))
 
     # Top-level parser for macro
     macro_description = ("Manage macros\n"
@@ -2685,10 +2915,9 @@ class Cmd(cmd.Cmd):
         matches = []
 
         # Check if this command uses argparse
-        func = self.cmd_func(command)
-        argparser = getattr(func, CMD_ATTR_ARGPARSER, None)
+        argparser = _get_argparser(self.cmd_func(command))
 
-        if func is not None and argparser is not None:
+        if argparser is not None:
             from .argparse_completer import AutoCompleter
             completer = AutoCompleter(argparser, self)
             matches = completer.complete_command_help(tokens[cmd_index:], text, line, begidx, endidx)
@@ -2718,10 +2947,10 @@ class Cmd(cmd.Cmd):
             # Getting help for a specific command
             func = self.cmd_func(args.command)
             help_func = getattr(self, HELP_FUNC_PREFIX + args.command, None)
-            argparser = getattr(func, CMD_ATTR_ARGPARSER, None)
+            argparser = _get_argparser(func)
 
             # If the command function uses argparse, then use argparse's help
-            if func is not None and argparser is not None:
+            if argparser is not None:
                 from .argparse_completer import AutoCompleter
                 completer = AutoCompleter(argparser, self)
                 tokens = [args.command] + args.subcommand
@@ -2749,6 +2978,11 @@ class Cmd(cmd.Cmd):
         # Get a sorted list of visible command names
         visible_commands = sorted(self.get_visible_commands(), key=self.default_sort_key)
 
+        # Prevent commands from showing as both a command and help topic in the output
+        help_topic_set = set(help_topics)
+        visible_command_set = set(visible_commands)
+        help_topics = [topic for topic in help_topics if topic not in visible_command_set]
+
         cmds_doc = []
         cmds_undoc = []
         cmds_cats = {}
@@ -2757,19 +2991,15 @@ class Cmd(cmd.Cmd):
             func = self.cmd_func(command)
             has_help_func = False
 
-            if command in help_topics:
-                # Prevent the command from showing as both a command and help topic in the output
-                help_topics.remove(command)
-
+            if command in help_topic_set:
                 # Non-argparse commands can have help_functions for their documentation
-                if not hasattr(func, CMD_ATTR_ARGPARSER):
+                if _get_argparser(func) is None:
                     has_help_func = True
 
-            if hasattr(func, CMD_ATTR_HELP_CATEGORY):
-                category = getattr(func, CMD_ATTR_HELP_CATEGORY)
-                cmds_cats.setdefault(category, [])
-                cmds_cats[category].append(command)
-            elif func.__doc__ or has_help_func:
+            category = getattr(func, CMD_ATTR_HELP_CATEGORY, None)
+            if category is not None:
+                cmds_cats.setdefault(category, []).append(command)
+            elif has_help_func or _get_command_doc(func):
                 cmds_doc.append(command)
             else:
                 cmds_undoc.append(command)
@@ -2813,13 +3043,13 @@ class Cmd(cmd.Cmd):
                     self.stdout.write('{:{ruler}<{width}}\n'.format('', ruler=self.ruler, width=80))
 
                 # Try to get the documentation string for each command
-                topics = self.get_help_topics()
+                topics = set(self.get_help_topics())
 
                 for command in cmds:
                     cmd_func = self.cmd_func(command)
 
                     # Non-argparse commands can have help_functions for their documentation
-                    if not hasattr(cmd_func, CMD_ATTR_ARGPARSER) and command in topics:
+                    if _get_argparser(cmd_func) is None and command in topics:
                         help_func = getattr(self, HELP_FUNC_PREFIX + command)
                         result = io.StringIO()
 
@@ -2837,7 +3067,7 @@ class Cmd(cmd.Cmd):
                         doc = result.getvalue()
 
                     else:
-                        doc = cmd_func.__doc__
+                        doc = _get_command_doc(cmd_func)
 
                     # Attempt to locate the first documentation block
                     if not doc:
@@ -2921,7 +3151,7 @@ class Cmd(cmd.Cmd):
 
         local_opts = opts
         if isinstance(opts, str):
-            local_opts = list(zip(opts.split(), opts.split()))
+            local_opts = opts.split()
         fulloptions = []
         for opt in local_opts:
             if isinstance(opt, str):
@@ -3064,8 +3294,6 @@ class Cmd(cmd.Cmd):
     @with_argparser(shell_parser, preserve_quotes=True)
     def do_shell(self, args: argparse.Namespace) -> None:
         """Execute a command as if at the OS prompt"""
-        import subprocess
-
         # Create a list of arguments to shell
         tokens = [args.command] + args.command_args
 
@@ -3109,9 +3337,10 @@ class Cmd(cmd.Cmd):
         sys.displayhook = sys.__displayhook__
         sys.excepthook = sys.__excepthook__
 
-    def _set_up_py_shell_env(self, interp: InteractiveConsole) -> _SavedCmd2Env:
+    def _set_up_py_shell_env(self, interp: 'code.InteractiveConsole') -> _SavedCmd2Env:
         """
         Set up interactive Python shell environment
+        :param interp: the code.InteractiveConsole that will run the Python shell
         :return: Class containing saved up cmd2 environment
         """
         cmd2_env = _SavedCmd2Env()
@@ -3130,6 +3359,8 @@ class Cmd(cmd.Cmd):
                 readline.add_history(item)
 
             if self.use_rawinput and self.completekey:
+                _init_readline_state()
+
                 # Set up tab completion for the Python console
                 # rlcompleter relies on the default settings of the Python readline module
                 if rl_type == RlType.GNU:
@@ -3237,6 +3468,7 @@ class Cmd(cmd.Cmd):
         Enter an interactive Python shell
         :return: True if running of commands should stop
         """
+        from code import InteractiveConsole
         from .py_bridge import PyBridge
         if self._in_py:
             err = "Recursively entering interactive Python consoles is not allowed."
@@ -3390,6 +3622,8 @@ class Cmd(cmd.Cmd):
         @with_argparser(Cmd2ArgumentParser(description="Enter an interactive IPython shell"))
         def do_ipy(self, _: argparse.Namespace) -> None:
             """Enter an interactive IPython shell"""
+            # noinspection PyUnresolvedReferences,PyPackageRequirements
+            from IPython import embed
             from .py_bridge import PyBridge
             banner = ('Entering an embedded IPython shell. Type quit or <Ctrl>-d to exit.\n'
                       'Run Python code from external files with: run filename.py\n')
@@ -3596,6 +3830,7 @@ class Cmd(cmd.Cmd):
             return
 
         # first we try and unpickle the history file
+        import pickle
         history = History()
 
         try:
@@ -3636,6 +3871,7 @@ class Cmd(cmd.Cmd):
         if not self.persistent_history_file:
             return
 
+        import pickle
         self.history.truncate(self._persistent_history_length)
         try:
             with open(self.persistent_history_file, 'wb') as fobj:
@@ -3682,10 +3918,10 @@ class Cmd(cmd.Cmd):
                     history_item = history_item.raw
                 for line in history_item.splitlines():
                     if first:
-                        command += '{}{}\n'.format(self.prompt, line)
+                        command += self.prompt + line + '\n'
                         first = False
                     else:
-                        command += '{}{}\n'.format(self.continuation_prompt, line)
+                        command += self.continuation_prompt + line + '\n'
                 transcript += command
 
                 # Use a StdSim object to capture output
@@ -3865,7 +4101,6 @@ class Cmd(cmd.Cmd):
 
         :param transcript_paths: list of transcript test file paths
         """
-        import time
         import unittest
         import cmd2
         from .transcript import Cmd2TestCase
@@ -4077,8 +4312,6 @@ class Cmd(cmd.Cmd):
                                  command being disabled.
                                  ex: message_to_print = "{} is currently disabled".format(COMMAND_NAME)
         """
-        import functools
-
         # If the commands is already disabled, then return
         if command in self.disabled_commands:
             return
@@ -4207,6 +4440,7 @@ class Cmd(cmd.Cmd):
     @classmethod
     def _validate_callable_param_count(cls, func: Callable, count: int) -> None:
         """Ensure a function has the given number of parameters."""
+        import inspect
         signature = inspect.signature(func)
         # validate that the callable has the right number of parameters
         nparam = len(signature.parameters)
@@ -4220,6 +4454,7 @@ class Cmd(cmd.Cmd):
     @classmethod
     def _validate_prepostloop_callable(cls, func: Callable[[None], None]) -> None:
         """Check parameter and return types for preloop and postloop hooks."""
+        import inspect
         cls._validate_callable_param_count(func, 0)
         # make sure there is no return notation
         signature = inspect.signature(func)
@@ -4241,6 +4476,7 @@ class Cmd(cmd.Cmd):
     @classmethod
     def _validate_postparsing_callable(cls, func: Callable[[plugin.PostparsingData], plugin.PostparsingData]) -> None:
         """Check parameter and return types for postparsing hooks"""
+        import inspect
         cls._validate_callable_param_count(func, 1)
         signature = inspect.signature(func)
         _, param = list(signature.parameters.items())[0]
@@ -4261,6 +4497,7 @@ class Cmd(cmd.Cmd):
     @classmethod
     def _validate_prepostcmd_hook(cls, func: Callable, data_type: Type) -> None:
         """Check parameter and return types for pre and post command hooks."""
+        import inspect
         signature = inspect.signature(func)
         # validate that the callable has the right number of parameters
         cls._validate_callable_param_count(func, 1)
@@ -4300,6 +4537,7 @@ class Cmd(cmd.Cmd):
     def _validate_cmdfinalization_callable(cls, func: Callable[[plugin.CommandFinalizationData],
                                                                plugin.CommandFinalizationData]) -> None:
         """Check parameter and return types for command finalization hooks."""
+        import inspect
         cls._validate_callable_param_count(func, 1)
         signature = inspect.signature(func)
         _, param = list(signature.parameters.items())[0]
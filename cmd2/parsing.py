@@ -12,6 +12,10 @@ from . import constants
 from . import utils
 
 
+# Without quotes, the tokens shlex finds are just runs of characters that aren't shlex whitespace (' \t\r\n')
+_UNQUOTED_TOKEN_RE = re.compile(r'[^ \t\r\n]+')
+
+
 def shlex_split(str_to_split: str) -> List[str]:
     """A wrapper around shlex.split() that uses cmd2's preferred arguments.
 
@@ -19,6 +23,9 @@ def shlex_split(str_to_split: str) -> List[str]:
     :param str_to_split: the string being split
     :return: A list of tokens
     """
+    # shlex is implemented in pure Python, so skip it when there are no quotes to handle
+    if '"' not in str_to_split and "'" not in str_to_split:
+        return _UNQUOTED_TOKEN_RE.findall(str_to_split)
     return shlex.split(str_to_split, comments=False, posix=False)
 
 
@@ -179,11 +179,7 @@ def remove_duplicates(list_to_prune: List) -> List:
     :param list_to_prune: the list being pruned of duplicates
     :return: The pruned list
     """
-    temp_dict = collections.OrderedDict()
-    for item in list_to_prune:
-        temp_dict[item] = None
-
-    return list(temp_dict.keys())
+    return list(collections.OrderedDict.fromkeys(list_to_prune))
 
 
 def norm_fold(astr: str) -> str:
@@ -267,7 +263,8 @@ def expand_user(token: str) -> str:
     Wrap os.expanduser() to support expanding ~ in quoted strings
     :param token: the string to expand
     """
-    if token:
+    # Only tokens containing ~ can need expanding
+    if '~' in token:
         if is_quoted(token):
             quote_char = token[0]
             token = strip_quotes(token)
@@ -8,11 +8,19 @@ This is meant to be run within a cmd2 session using run_pyscript.
 import argparse
 import os
 import sys
-from typing import List, TextIO
+from typing import List, Optional, TextIO
 
 ASTERISKS = "********************************************************"
 
 
+def get_argparser(func) -> Optional[argparse.ArgumentParser]:
+    """Get the ArgumentParser of a command function, building it first if it was given as a factory"""
+    get_parser = getattr(func, 'get_argparser', None)
+    if get_parser is None:
+        return getattr(func, 'argparser', None)
+    return get_parser()
+
+
 def get_sub_commands(parser: argparse.ArgumentParser) -> List[str]:
     """Get a list of subcommands for an ArgumentParser"""
     sub_cmds = []
@@ -95,7 +103,7 @@ def main() -> None:
 
         if is_command:
             # Add any subcommands
-            for subcmd in get_sub_commands(getattr(self.cmd_func(item), 'argparser', None)):
+            for subcmd in get_sub_commands(get_argparser(self.cmd_func(item))):
                 full_cmd = '{} {}'.format(item, subcmd)
                 add_help_to_file(full_cmd, outfile, is_command)
 
@@ -23,6 +23,17 @@ def test_ansi_safe_wcswidth():
     assert ansi.ansi_safe_wcswidth(ansi_str) != len(ansi_str)
 
 
+@pytest.mark.parametrize('text,width', [
+    ('', 0),
+    ('hello', 5),
+    ('tab\there', -1),
+    ('caf\u00e9', 4),
+    ('\u4e2d\u6587', 4),
+])
+def test_ansi_safe_wcswidth_widths(text, width):
+    assert ansi.ansi_safe_wcswidth(text) == width
+
+
 def test_style_none():
     base_str = HELLO_WORLD
     ansi_str = base_str
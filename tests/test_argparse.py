@@ -182,6 +182,83 @@ def test_argparse_prog(argparse_app):
     progname = out[0].split(' ')[1]
     assert progname == 'tag'
 
+def _build_lazy_parser() -> argparse.ArgumentParser:
+    lazy_parser = argparse.ArgumentParser(description='built on first use')
+    lazy_parser.add_argument('word', help='word to echo')
+    return lazy_parser
+
+def test_argparse_parser_factory():
+    class LazyApp(cmd2.Cmd):
+        @cmd2.with_argparser(_build_lazy_parser)
+        def do_lazy(self, args):
+            self.stdout.write(args.word)
+
+    app = LazyApp()
+
+    # The factory isn't called until the parser is needed
+    assert not hasattr(app.do_lazy, cmd2.cmd2.CMD_ATTR_ARGPARSER)
+
+    out, err = run_cmd(app, 'lazy hello')
+    assert out == ['hello']
+
+    parser = getattr(app.do_lazy, cmd2.cmd2.CMD_ATTR_ARGPARSER)
+    assert parser.prog == 'lazy'
+    assert app.do_lazy.__doc__ == 'built on first use'
+
+    # The same parser is reused
+    run_cmd(app, 'lazy again')
+    assert getattr(app.do_lazy, cmd2.cmd2.CMD_ATTR_ARGPARSER) is parser
+
+def test_argparse_parser_factory_help():
+    class LazyApp(cmd2.Cmd):
+        @cmd2.with_argparser_and_unknown_args(_build_lazy_parser)
+        def do_lazy(self, args, extra):
+            self.stdout.write(args.word)
+
+    app = LazyApp()
+    out, err = run_cmd(app, 'help lazy')
+    assert out[0].startswith('usage: lazy')
+    assert out[2] == 'built on first use'
+
+def test_argparse_parser_factory_help_menu():
+    class LazyApp(cmd2.Cmd):
+        @cmd2.with_argparser(_build_lazy_parser)
+        def do_lazy(self, args):
+            self.stdout.write(args.word)
+
+    # Before the command is ever run, it is listed as documented and its description is shown
+    app = LazyApp()
+    out, err = run_cmd(app, 'help')
+    undoc_index = out.index('Undocumented commands:') if 'Undocumented commands:' in out else len(out)
+    assert any('lazy' in line for line in out[:undoc_index])
+    assert not any('lazy' in line for line in out[undoc_index:])
+
+    app = LazyApp()
+    out, err = run_cmd(app, 'help -v')
+    assert any(line.startswith('lazy') and 'built on first use' in line for line in out)
+
+def test_argparse_parser_attribute_only():
+    parser = argparse.ArgumentParser(prog='manual', description='parser set by hand')
+
+    def do_manual(self, arg):
+        pass
+
+    # Commands which only carry the argparser attribute still use that parser for help
+    setattr(do_manual, cmd2.cmd2.CMD_ATTR_ARGPARSER, parser)
+
+    class ManualApp(cmd2.Cmd):
+        pass
+
+    ManualApp.do_manual = do_manual
+    app = ManualApp()
+    assert cmd2.cmd2._get_argparser(app.do_manual) is parser
+
+    out, err = run_cmd(app, 'help manual')
+    assert out[0].startswith('usage: manual')
+
+    out, err = run_cmd(app, 'help -v')
+    assert any(line.startswith('manual') and 'parser set by hand' in line for line in out)
+
 def test_arglist(argparse_app):
     out, err = run_cmd(argparse_app, 'arglist "we  should" get these')
     assert out[0] == 'True'
@@ -92,6 +92,23 @@ def test_command_starts_with_shortcut():
         app = cmd2.Cmd(shortcuts={'help': 'fake'})
     assert "Invalid command name 'help'" in str(excinfo.value)
 
+def test_command_name_validation_cached():
+    class ValidatedApp(cmd2.Cmd):
+        pass
+
+    ValidatedApp()
+    settings = ValidatedApp.__dict__['_validated_command_name_settings']
+    assert len(settings) == 1
+
+    # A second instance with the same settings doesn't add anything
+    ValidatedApp()
+    assert len(settings) == 1
+
+    # Different shortcuts are validated again
+    with pytest.raises(ValueError):
+        ValidatedApp(shortcuts={'help': 'fake'})
+    assert len(settings) == 1
+
 def test_base_show(base_app):
     # force editor to be 'vim' so test is repeatable across platforms
     base_app.editor = 'vim'
@@ -242,6 +259,37 @@ def test_base_shell(base_app, monkeypatch):
     assert m.called
 
 
+@pytest.mark.skipif(sys.platform == 'win32', reason="Windows doesn't restore the terminal after commands")
+def test_terminal_restored_with_termios(base_app, monkeypatch):
+    popen_mock = mock.Mock()
+    monkeypatch.setattr("subprocess.Popen", popen_mock)
+    tcsetattr_mock = mock.Mock()
+    monkeypatch.setattr("termios.tcsetattr", tcsetattr_mock)
+    monkeypatch.setattr(sys.stdin, "fileno", lambda: 0)
+
+    base_app.stdout = mock.MagicMock()
+    base_app.stdout.isatty.return_value = True
+    base_app._saved_termios = ['saved']
+
+    base_app.onecmd_plus_hooks('help')
+    assert tcsetattr_mock.call_args[0][2] == ['saved']
+    assert not popen_mock.called
+
+    # Without saved settings, fall back to stty
+    tcsetattr_mock.reset_mock()
+    base_app._saved_termios = None
+    base_app.onecmd_plus_hooks('help')
+    assert not tcsetattr_mock.called
+    assert popen_mock.call_args[0][0] == ['stty', 'sane']
+
+
+def test_init_without_stdin(monkeypatch):
+    # Daemons and embedded interpreters can run with no stdin at all
+    monkeypatch.setattr(sys, 'stdin', None)
+    app = cmd2.Cmd()
+    assert app._saved_termios is None
+
+
 def test_base_py(base_app):
     # Create a variable and make sure we can see it
     out, err = run_cmd(base_app, 'py qqq=3')
@@ -947,6 +995,14 @@ def test_ansi_prompt_escaped():
         assert readline_safe_prompt.startswith(readline_hack_start + ansi.fg_lookup(color) + readline_hack_end)
         assert readline_safe_prompt.endswith(readline_hack_start + ansi.FG_RESET + readline_hack_end)
 
+def test_visible_prompt(base_app):
+    base_app.prompt = ansi.style('InColor', fg='cyan')
+    assert base_app.visible_prompt == 'InColor'
+
+    # Changing the prompt changes the visible prompt
+    base_app.prompt = 'Plain '
+    assert base_app.visible_prompt == 'Plain '
+
 
 class HelpApp(cmd2.Cmd):
     """Class for testing custom help_* methods which override docstring help."""
@@ -1639,6 +1695,23 @@ def test_alias_create(base_app):
     out, err = run_cmd(base_app, 'alias list fake')
     assert out == normalize('alias create fake run_pyscript')
 
+def test_alias_and_macro_list_sorted(base_app):
+    # Nothing is printed when there are no aliases or macros
+    out, err = run_cmd(base_app, 'alias list')
+    assert out == []
+    out, err = run_cmd(base_app, 'macro list')
+    assert out == []
+
+    run_cmd(base_app, 'alias create b help')
+    run_cmd(base_app, 'alias create a shortcuts')
+    out, err = run_cmd(base_app, 'alias list')
+    assert out == normalize('alias create a shortcuts\nalias create b help')
+
+    run_cmd(base_app, 'macro create d help {1}')
+    run_cmd(base_app, 'macro create c shortcuts')
+    out, err = run_cmd(base_app, 'macro list')
+    assert out == normalize('macro create c shortcuts\nmacro create d help {1}')
+
 def test_alias_create_with_quoted_value(base_app):
     """Demonstrate that quotes in alias value will be preserved (except for redirectors and terminators)"""
 
@@ -1650,6 +1723,13 @@ def test_alias_create_with_quoted_value(base_app):
     out, err = run_cmd(base_app, 'alias list fake')
     assert out == normalize('alias create fake help > "out file.txt" ;')
 
+def test_alias_and_macro_create_preserve_redirection_tokens(base_app):
+    # Creating aliases and macros must not add the terminators to the shared constant
+    orig_tokens = list(constants.REDIRECTION_TOKENS)
+    run_cmd(base_app, 'alias create fake help ";"')
+    run_cmd(base_app, 'macro create fake2 help ";"')
+    assert constants.REDIRECTION_TOKENS == orig_tokens
+
 @pytest.mark.parametrize('alias_name', invalid_command_name)
 def test_alias_create_invalid_name(base_app, alias_name, capsys):
     out, err = run_cmd(base_app, 'alias create {} help'.format(alias_name))
@@ -1775,6 +1855,14 @@ def test_macro_create_with_escaped_args(base_app):
     out, err = run_cmd(base_app, 'fake')
     assert err[0].startswith('No help on {1}')
 
+def test_macro_resolve_with_escaped_and_normal_args(base_app):
+    # An escaped argument with the same number as a normal argument must not affect where the normal one is replaced
+    out, err = run_cmd(base_app, 'macro create fake help {1} {{1}}{2} {{{2}}}')
+    assert out == normalize("Macro 'fake' created")
+
+    statement = base_app.statement_parser.parse('fake arg1 arg2')
+    assert base_app._resolve_macro(statement) == 'help arg1 {1}arg2 {{2}}'
+
 def test_macro_usage_with_missing_args(base_app):
     # Create the macro
     out, err = run_cmd(base_app, 'macro create fake help {1} {2}')
@@ -1956,6 +2044,51 @@ def test_get_all_commands(base_app):
                          'py', 'quit', 'run_pyscript', 'run_script', 'set', 'shell', 'shortcuts']
     assert commands == expected_commands
 
+def test_get_all_commands_dynamic():
+    class DynamicApp(cmd2.Cmd):
+        pass
+
+    app = DynamicApp()
+    assert 'dynamic' not in app.get_all_commands()
+
+    # Commands added to and removed from the class after the list was first built are detected
+    DynamicApp.do_dynamic = lambda self, args: None
+    assert 'dynamic' in app.get_all_commands()
+
+    del DynamicApp.do_dynamic
+    assert 'dynamic' not in app.get_all_commands()
+
+    # Swapping one command for another leaves the class with the same number of attributes
+    DynamicApp.do_old = lambda self, args: None
+    assert 'old' in app.get_all_commands()
+    del DynamicApp.do_old
+    DynamicApp.do_new = lambda self, args: None
+    commands = app.get_all_commands()
+    assert 'old' not in commands
+    assert 'new' in commands
+
+def test_get_help_topics_dynamic():
+    class DynamicApp(cmd2.Cmd):
+        pass
+
+    app = DynamicApp()
+    assert 'dynamic' not in app.get_help_topics()
+
+    # Help functions added to and removed from the class after the list was first built are detected
+    DynamicApp.help_dynamic = lambda self: None
+    assert 'dynamic' in app.get_help_topics()
+
+    del DynamicApp.help_dynamic
+    assert 'dynamic' not in app.get_help_topics()
+
+    # Deleting a help function and adding a command in the same class is also detected
+    DynamicApp.help_old = lambda self: None
+    assert 'old' in app.get_help_topics()
+    del DynamicApp.help_old
+    DynamicApp.do_new = lambda self, args: None
+    assert 'old' not in app.get_help_topics()
+    assert 'new' in app.get_all_commands()
+
 def test_get_help_topics(base_app):
     # Verify that the base app has no additional help_foo methods
     custom_help = base_app.get_help_topics()
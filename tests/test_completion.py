@@ -376,6 +376,36 @@ def test_path_completion_nomatch(cmd2_app, request):
 
     assert cmd2_app.path_complete(text, line, begidx, endidx) == []
 
+def test_path_completion_literal_brackets(cmd2_app, tmpdir):
+    # Brackets in the text are matched literally instead of as a glob character class
+    tmpdir.join('file[1].txt').write('')
+    tmpdir.join('file1.txt').write('')
+
+    text = os.path.join(str(tmpdir), 'file[1]')
+    line = 'shell cat {}'.format(text)
+
+    endidx = len(line)
+    begidx = endidx - len(text)
+
+    assert cmd2_app.path_complete(text, line, begidx, endidx) == [text + '.txt']
+
+def test_path_completion_hidden(cmd2_app, tmpdir):
+    # Hidden files are only matched when the text starts with a period
+    tmpdir.join('.hidden').write('')
+    tmpdir.join('visible').write('')
+
+    text = str(tmpdir) + os.path.sep
+    line = 'shell cat {}'.format(text)
+    endidx = len(line)
+    begidx = endidx - len(text)
+    assert cmd2_app.path_complete(text, line, begidx, endidx) == [text + 'visible']
+
+    text += '.'
+    line = 'shell cat {}'.format(text)
+    endidx = len(line)
+    begidx = endidx - len(text)
+    assert cmd2_app.path_complete(text, line, begidx, endidx) == [text + 'hidden']
+
 
 def test_default_to_shell_completion(cmd2_app, request):
     cmd2_app.default_to_shell = True
@@ -487,6 +517,25 @@ def test_path_completion_complete_user(cmd2_app):
     expected = text + os.path.sep
     assert expected in completions
 
+@pytest.mark.skipif(sys.platform == 'win32', reason="Windows lacks the pwd module")
+def test_path_completion_complete_user_cached(cmd2_app):
+    import pwd
+    text = '~'
+    line = 'shell fake {}'.format(text)
+    endidx = len(line)
+    begidx = endidx - len(text)
+
+    with mock.patch.object(pwd, 'getpwall', wraps=pwd.getpwall) as m:
+        first = cmd2_app.path_complete(text, line, begidx, endidx)
+        second = cmd2_app.path_complete(text, line, begidx, endidx)
+        assert first == second
+        assert m.call_count == 1
+
+        # The password database is read again once the cache is too old
+        cmd2_app._home_dir_users_time -= cmd2.cmd2._USER_CACHE_TIMEOUT + 1
+        cmd2_app.path_complete(text, line, begidx, endidx)
+        assert m.call_count == 2
+
 def test_path_completion_user_path_expansion(cmd2_app):
     # Run path with a tilde and a slash
     if sys.platform.startswith('win'):
@@ -64,6 +64,17 @@ def test_parse_empty_string_default(default_parser):
     assert statement.command_and_args == line
     assert statement.argv == statement.arg_list
 
+@pytest.mark.parametrize('line', [
+    '',
+    '  command  arg\t\targ2\r\n',
+    'command\xa0arg',
+    'command "quoted  arg" \'single quoted\'',
+    'command mid"quote arg',
+])
+def test_shlex_split_matches_shlex(line):
+    import shlex
+    assert shlex_split(line) == shlex.split(line, comments=False, posix=False)
+
 @pytest.mark.parametrize('line,tokens', [
     ('command', ['command']),
     (constants.COMMENT_CHAR + 'comment', []),
@@ -115,6 +115,14 @@ def test_quote_string_if_needed_no():
     your_str = "'Hello World'"
     assert cu.quote_string_if_needed(your_str) == your_str
 
+def test_expand_user():
+    import os
+    home = os.path.expanduser('~')
+    assert cu.expand_user('~/file') == home + '/file'
+    assert cu.expand_user('"~/my file"') == '"' + home + '/my file"'
+    assert cu.expand_user('"no tilde"') == '"no tilde"'
+    assert cu.expand_user('') == ''
+
 
 @pytest.fixture
 def stdout_sim():